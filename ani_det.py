@@ -5,32 +5,63 @@ Captures images and runs inference for animal detection.
 """
 
 import numpy as np
+# Pillow-SIMD (pip install pillow-simd, built with NEON on the Pi) is a
+# drop-in replacement for Pillow with a SIMD BILINEAR resize kernel.
 from PIL import Image
 import tflite_runtime.interpreter as tflite
 import time
 import os
+import shutil
+import subprocess
 import sys
+from contextlib import nullcontext, redirect_stdout
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    from picamera2 import Picamera2
+except ImportError:  # fall back to the rpicam-still/raspistill apps
+    Picamera2 = None
+
 
 # ==================== CONFIGURATION ====================
 MODEL_PATH = "realfinalnocap.tflite"
 CAPTURE_FILENAME = "capture.jpg"
 CAPTURE_WIDTH = 640
 CAPTURE_HEIGHT = 480
-CAMERA_TIMEOUT_MS = 1500
+CAMERA_TIMEOUT_MS = 1500  # raspistill only; libcamera apps use --immediate
 CONFIDENCE_THRESHOLD = 0.5
 
+# --serve runs on these cores at this SCHED_FIFO priority, away from the
+# GPIO loop in main.py (which keeps cores 0-1)
+DETECTOR_CPUS = {2, 3}
+DETECTOR_PRIORITY = 20
+
+# Set VERBOSE=1 for the full human-readable report in one-shot mode
+VERBOSE = bool(os.getenv("VERBOSE"))
+
+# Frames scored per trigger in --serve mode (one invoke, averaged)
+BATCH_FRAMES = 2
+
+# Longest a --serve reply may take, sent to the client in the ready line:
+# a Picamera2 frame + inference, plus a camera app's start-up (and
+# raspistill's CAMERA_TIMEOUT_MS) when photos come from the command line
+REPLY_TIMEOUT = 2.0    # seconds
+CAMERA_STARTUP = 1.5   # seconds
+
 # Camera command priority (newer to older)
 CAMERA_COMMANDS = ["rpicam-still", "libcamera-still", "raspistill"]
 
+# float32 scale for uint8 pixels, kept float32 so the multiply never upcasts
+PIXEL_SCALE = np.float32(1.0 / 255.0)
+
 
 # ==================== HELPER FUNCTIONS ====================
+@lru_cache(maxsize=None)
 def find_camera_command():
-    """Detects which camera command is available on the system."""
+    """Detects which camera command is available on the system (probed once)."""
     for cmd in CAMERA_COMMANDS:
-        result = os.system(f"which {cmd} > /dev/null 2>&1")
-        if result == 0:
+        if shutil.which(cmd):
             print(f"✓ Found camera command: {cmd}")
             return cmd
     raise RuntimeError(
@@ -49,11 +80,51 @@ def verify_model_exists():
     print(f"✓ Model found: {MODEL_PATH}")
 
 
+def pin_to_cpus(cpus, priority):
+    """
+    Pins this process to the given cores and switches it to SCHED_FIFO.
+    Call before load_model so TFLite's worker threads inherit both.
+    The cores are checked against the machine, not the inherited mask: a
+    detector started from main.py inherits its MAIN_CPUS pinning.
+    The priority change needs root or CAP_SYS_NICE (or start under chrt -f).
+    """
+    cpus = cpus & set(range(os.cpu_count() or 1))
+    if cpus:
+        try:
+            os.sched_setaffinity(0, cpus)
+            print(f"✓ Pinned to CPUs {sorted(cpus)}")
+        except OSError as e:
+            print(f"⚠ Cannot pin to CPUs {sorted(cpus)}: {e}")
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        print(f"✓ SCHED_FIFO priority {priority}")
+    except PermissionError:
+        print("⚠ No permission for SCHED_FIFO, keeping default scheduling")
+
+
 # ==================== MODEL SETUP ====================
-def load_model():
-    """Loads TFLite model and returns interpreter with input/output details."""
+def load_model(batch_size=1):
+    """
+    Loads TFLite model and returns interpreter with input/output details.
+    batch_size > 1 resizes the input so several frames share one invoke();
+    models whose graph can't be resized fall back to a batch of 1.
+    """
     try:
-        interpreter = tflite.Interpreter(model_path=MODEL_PATH)
+        # Spread conv/matmul kernels over every core we may run on
+        interpreter = tflite.Interpreter(
+            model_path=MODEL_PATH, num_threads=len(os.sched_getaffinity(0))
+        )
+        
+        if batch_size > 1:
+            input_index = interpreter.get_input_details()[0]['index']
+            input_shape = list(interpreter.get_input_details()[0]['shape'])
+            try:
+                interpreter.resize_tensor_input(input_index, [batch_size] + input_shape[1:])
+                interpreter.allocate_tensors()
+            except Exception as e:
+                print(f"⚠ Model can't take a batch of {batch_size} ({e}), using 1")
+                interpreter.resize_tensor_input(input_index, input_shape)
+        
         interpreter.allocate_tensors()
         
         input_details = interpreter.get_input_details()[0]
@@ -75,7 +146,14 @@ def load_model():
         else:
             raise ValueError(f"Unexpected input shape: {input_shape}")
         
-        return interpreter, input_details, output_details, (img_width, img_height), input_dtype
+        # Accessor for the interpreter's own input memory; preprocessing
+        # writes into it so invoke() needs no set_tensor copy
+        input_tensor = interpreter.tensor(input_details['index'])
+        
+        return (
+            interpreter, input_details, output_details,
+            (img_width, img_height), input_dtype, input_tensor
+        )
         
     except Exception as e:
         raise RuntimeError(f"Failed to load model: {e}")
@@ -95,28 +173,27 @@ def capture_photo(camera_cmd, filename=CAPTURE_FILENAME):
     
     # Build command based on camera type
     if camera_cmd in ["rpicam-still", "libcamera-still"]:
-        cmd = (
-            f"{camera_cmd} -o {filename} "
-            f"--width {CAPTURE_WIDTH} --height {CAPTURE_HEIGHT} "
-            f"--nopreview -t {CAMERA_TIMEOUT_MS}"
-        )
+        # --immediate skips the preview/AE warm-up before the capture
+        cmd = [
+            camera_cmd, "-o", filename,
+            "--width", str(CAPTURE_WIDTH), "--height", str(CAPTURE_HEIGHT),
+            "--immediate", "--nopreview", "-t", "1",
+        ]
     else:  # raspistill (legacy)
-        cmd = (
-            f"{camera_cmd} -o {filename} "
-            f"-w {CAPTURE_WIDTH} -h {CAPTURE_HEIGHT} "
-            f"-n -t {CAMERA_TIMEOUT_MS}"
-        )
+        cmd = [
+            camera_cmd, "-o", filename,
+            "-w", str(CAPTURE_WIDTH), "-h", str(CAPTURE_HEIGHT),
+            "-n", "-t", str(CAMERA_TIMEOUT_MS),
+        ]
     
-    # Execute capture
-    result = os.system(cmd)
+    # Execute capture without a shell; returns once the file is written.
+    # stdout is discarded so it can't leak into the --serve reply pipe.
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL).returncode
     
     # Verify capture success
     if result != 0:
         raise RuntimeError(f"Camera command failed with exit code {result}")
     
-    # Wait for file to be written
-    time.sleep(0.3)
-    
     if not os.path.exists(filename):
         raise RuntimeError("Image file was not created after capture")
     
@@ -124,11 +201,38 @@ def capture_photo(camera_cmd, filename=CAPTURE_FILENAME):
     return filename
 
 
+def open_camera(img_size):
+    """
+    Starts a Picamera2 stream that delivers frames already scaled to the
+    model's input size. Used by --serve so the sensor stays running.
+    """
+    picam2 = Picamera2()
+    # Picamera2 names formats by register order: "BGR888" is RGB in memory
+    config = picam2.create_still_configuration(
+        main={"size": img_size, "format": "BGR888"}
+    )
+    picam2.configure(config)
+    picam2.start()
+    print(f"✓ Camera streaming at {img_size[0]}x{img_size[1]}")
+    return picam2
+
+
+def capture_frame(picam2, img_size):
+    """Grabs one (H, W, 3) uint8 RGB frame from the running camera, no JPEG round-trip."""
+    frame = picam2.capture_array("main")
+    width, height = img_size
+    return frame[:height, :width, :3]
+
+
 # ==================== PREPROCESSING ====================
-def preprocess_image(image_path, img_size, input_dtype):
+def preprocess_image(image_path, img_size, input_dtype, input_tensor, input_quant=(0.0, 0)):
     """
-    Loads, resizes, and preprocesses image for model inference.
-    Handles both float32 (normalized) and uint8 (raw) inputs.
+    Loads, resizes, and preprocesses image for model inference, writing the
+    result straight into the interpreter's input tensor.
+    Handles float32 (normalized), uint8 (raw) and int8 (quantized) inputs;
+    input_quant is the (scale, zero_point) pair from the input details.
+    The resize runs on uint8 pixels; float32 scaling happens afterwards on
+    the small resized array.
     """
     try:
         # Load and convert to RGB
@@ -137,37 +241,61 @@ def preprocess_image(image_path, img_size, input_dtype):
         # Resize to model's expected size
         image = image.resize(img_size, Image.BILINEAR)
         
-        # Convert to numpy array with appropriate dtype
-        if input_dtype == np.float32:
-            img_array = np.asarray(image, dtype=np.float32) / 255.0
-        elif input_dtype == np.uint8:
-            img_array = np.asarray(image, dtype=np.uint8)
-        else:
-            raise ValueError(f"Unsupported input dtype: {input_dtype}")
-        
-        # Add batch dimension: (H, W, C) -> (1, H, W, C)
-        img_array = np.expand_dims(img_array, axis=0)
+        img_array = np.asarray(image, dtype=np.uint8)
         
-        return img_array
+        fill_input_tensor(img_array, input_dtype, input_tensor, input_quant)
         
     except Exception as e:
         raise RuntimeError(f"Failed to preprocess image: {e}")
 
 
+@lru_cache(maxsize=None)
+def int8_lookup_table(scale, zero_point):
+    """
+    Full-integer model trained on [0, 1] inputs: the int8 value for every
+    possible uint8 pixel, built once from the input scale/zero_point.
+    """
+    lut = np.round(np.arange(256) / (255.0 * scale) + zero_point)
+    return np.clip(lut, -128, 127).astype(np.int8)
+
+
+def fill_input_tensor(img_array, input_dtype, input_tensor, input_quant=(0.0, 0), slot=0):
+    """
+    Converts a model-sized (H, W, 3) uint8 RGB array in place into batch
+    entry `slot` of the input tensor.
+    """
+    # (H, W, C) slot of the (N, H, W, C) input tensor. Kept local only:
+    # TFLite refuses to invoke() while such a view is still alive.
+    input_buffer = input_tensor()[slot]
+    
+    # Convert to the model's dtype in place: one fused cast+scale pass
+    if input_dtype == np.float32:
+        np.multiply(img_array, PIXEL_SCALE, out=input_buffer, casting="unsafe")
+    elif input_dtype == np.uint8:
+        np.copyto(input_buffer, img_array)
+    elif input_dtype == np.int8:
+        np.take(int8_lookup_table(*input_quant), img_array, out=input_buffer)
+    else:
+        raise ValueError(f"Unsupported input dtype: {input_dtype}")
+
+
 # ==================== INFERENCE ====================
-def run_inference(interpreter, input_details, output_details, image_array):
-    """Runs model inference and returns output probabilities."""
+def run_inference(interpreter, output_details):
+    """Runs model inference on the filled input tensor and returns output probabilities."""
     try:
-        # Set input tensor
-        interpreter.set_tensor(input_details['index'], image_array)
-        
         # Run inference
-        start_time = time.time()
+        start_ns = time.monotonic_ns()
         interpreter.invoke()
-        inference_time = (time.time() - start_time) * 1000  # milliseconds
+        inference_time = (time.monotonic_ns() - start_ns) / 1e6  # milliseconds
+        
+        # Get output tensor, dequantizing integer outputs to probabilities
+        output = interpreter.get_tensor(output_details['index'])
+        scale, zero_point = output_details['quantization']
+        if scale:
+            output = (output.astype(np.float32) - zero_point) * scale
         
-        # Get output tensor
-        output = interpreter.get_tensor(output_details['index'])[0]
+        # Average the batch (a single row unless frames were batched)
+        output = output.mean(axis=0)
         
         print(f"✓ Inference completed in {inference_time:.1f}ms")
         
@@ -209,73 +337,164 @@ def interpret_results(output_probs, threshold=CONFIDENCE_THRESHOLD):
     }
 
 
+# ==================== PIPELINE ====================
+def classify(camera, interpreter, input_details, output_details, img_size, input_dtype,
+             input_tensor):
+    """
+    Captures one photo, runs it through the model and returns
+    (results, inference_time). camera is either a running Picamera2 or the
+    name of a camera command from find_camera_command().
+    """
+    if not isinstance(camera, str):
+        # 3-4. Model-sized frames straight from the sensor into the input
+        # tensor, one per batch entry, all scored by a single invoke()
+        for slot in range(input_details['shape'][0]):
+            frame = capture_frame(camera, img_size)
+            fill_input_tensor(
+                frame, input_dtype, input_tensor, input_details['quantization'], slot
+            )
+        output_probs, inference_time = run_inference(interpreter, output_details)
+        return interpret_results(output_probs), inference_time
+
+    camera_cmd = camera
+
+    # 3. Capture photo
+    # print("\n[3/5] Capturing image...")
+    img_path = capture_photo(camera_cmd)
+
+    # 4. Preprocess
+    # print("\n[4/5] Preprocessing image...")
+    preprocess_image(
+        img_path, img_size, input_dtype, input_tensor, input_details['quantization']
+    )
+    # print(f"✓ Preprocessed into input tensor: {input_details['shape']}")
+
+    # 5. Run inference
+    # print("\n[5/5] Running inference...")
+    output_probs, inference_time = run_inference(interpreter, output_details)
+
+    # Interpret results
+    # print(f"\nRaw output: {output_probs}")
+    results = interpret_results(output_probs)
+    return results, inference_time
+
+
 # ==================== MAIN FUNCTION ====================
 def main():
-    # print('Real final')
-    """Main execution pipeline."""
-
-    # print("=" * 50)
-    # print("Raspberry Pi Animal Classifier")
-    # print("=" * 50)
+    """
+    One-shot pipeline. Only the machine-readable animal/no_animal token is
+    printed unless VERBOSE is set in the environment.
+    """
+    chatter = nullcontext(sys.stdout) if VERBOSE else open(os.devnull, "w")
 
     try:
-        # 1. Setup and verification
-        # print("\n[1/5] Verifying setup...")
-        verify_model_exists()
-        camera_cmd = find_camera_command()
-
-        # 2. Load model
-        # print("\n[2/5] Loading model...")
-        interpreter, input_details, output_details, img_size, input_dtype = load_model()
-
-        # 3. Capture photo
-        # print("\n[3/5] Capturing image...")
-        img_path = capture_photo(camera_cmd)
-
-        # 4. Preprocess
-        # print("\n[4/5] Preprocessing image...")
-        img_array = preprocess_image(img_path, img_size, input_dtype)
-        # print(f"✓ Preprocessed shape: {img_array.shape}")
-
-        # 5. Run inference
-        # print("\n[5/5] Running inference...")
-        output_probs, inference_time = run_inference(
-            interpreter, input_details, output_details, img_array
-        )
+        with chatter as out, redirect_stdout(out):
+            # print('Real final')
+            # print("=" * 50)
+            # print("Raspberry Pi Animal Classifier")
+            # print("=" * 50)
+
+            # 1. Setup and verification
+            # print("\n[1/5] Verifying setup...")
+            verify_model_exists()
+            camera_cmd = find_camera_command()
+
+            # 2. Load model
+            # print("\n[2/5] Loading model...")
+            (interpreter, input_details, output_details,
+             img_size, input_dtype, input_tensor) = load_model()
+
+            # 3-5. Capture, preprocess and run inference
+            results, inference_time = classify(
+                camera_cmd, interpreter, input_details, output_details, img_size, input_dtype,
+                input_tensor
+            )
+
+            # Display results
+            print("\n" + "=" * 50)
+            print("RESULTS")
+            print("=" * 50)
+            print(f"Animal probability: {results['animal_probability']:.4f}")
+            print(f"No-animal probability: {results['no_animal_probability']:.4f}")
+            print(f"Confidence: {results['confidence']:.4f}")
+            print(f"Inference time: {inference_time:.2f}ms")
+            print()
+            print("ANIMAL DETECTED" if results["is_animal"] else "NO ANIMAL DETECTED")
+            print("=" * 50)
+
+        # Final animal/no-animal token, the one line main.py reads
+        sys.stdout.write("animal\n" if results["is_animal"] else "no_animal\n")
+        sys.stdout.flush()
+        return 0
 
-        # Interpret results
-        # print(f"\nRaw output: {output_probs}")
-        results = interpret_results(output_probs)
-
-        # Display results
-        print("\n" + "=" * 50)
-        print("RESULTS")
-        print("=" * 50)
-        print(f"Animal probability: {results['animal_probability']:.4f}")
-        print(f"No-animal probability: {results['no_animal_probability']:.4f}")
-        print(f"Confidence: {results['confidence']:.4f}")
-        print(f"Inference time: {inference_time:.2f}ms")
-        print()
-
-        # Final animal/no-animal message (corrected)
-        if results["is_animal"]:
-            print("ANIMAL DETECTED")
-            print("animal")      # machine-readable token
-        else:
-            print("NO ANIMAL DETECTED")
-            print("no_animal")   # machine-readable token
+    except KeyboardInterrupt:
+        print("\n\nInterrupted by user")
+        return 130
 
-        print("=" * 50)
+    except Exception as e:
+        print(f"\n\nERROR: {e}", file=sys.stderr)
+        return 1
+
+
+def serve():
+    """
+    Persistent mode used by the crash-prediction loop: the model and camera
+    are set up once and "ready <seconds>" (the longest a reply may take) is
+    written to stdout, then every line read on stdin classifies one photo
+    and is answered with a single "animal" / "no_animal" / "error" line.
+    All progress output goes to stderr to keep the protocol clean.
+    """
+    reply = sys.stdout
+    camera = None
+
+    try:
+        with redirect_stdout(sys.stderr):
+            verify_model_exists()
+            pin_to_cpus(DETECTOR_CPUS, DETECTOR_PRIORITY)
+            # Batching needs the streaming camera; the camera apps give one photo
+            batch_size = BATCH_FRAMES if Picamera2 is not None else 1
+            (interpreter, input_details, output_details,
+             img_size, input_dtype, input_tensor) = load_model(batch_size)
+            if Picamera2 is not None:
+                camera = open_camera(img_size)
+            else:
+                camera = find_camera_command()
+
+        reply_timeout = REPLY_TIMEOUT
+        if Picamera2 is None:
+            reply_timeout += CAMERA_STARTUP
+            if camera == "raspistill":
+                reply_timeout += CAMERA_TIMEOUT_MS / 1000
+        reply.write(f"ready {reply_timeout:.1f}\n")
+        reply.flush()
+
+        while sys.stdin.readline():
+            try:
+                with redirect_stdout(sys.stderr):
+                    results, _ = classify(
+                        camera, interpreter, input_details, output_details,
+                        img_size, input_dtype, input_tensor
+                    )
+                token = "animal" if results["is_animal"] else "no_animal"
+            except Exception as e:
+                print(f"ERROR: {e}", file=sys.stderr)
+                token = "error"
+
+            reply.write(token + "\n")
+            reply.flush()
         return 0
 
     except KeyboardInterrupt:
-        print("\n\nInterrupted by user")
         return 130
 
     except Exception as e:
         print(f"\n\nERROR: {e}", file=sys.stderr)
         return 1
 
+    finally:
+        if camera is not None and not isinstance(camera, str):
+            camera.close()
+
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(serve() if "--serve" in sys.argv[1:] else main())
\ No newline at end of file
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Client side of the animal detector's --serve mode: the detector process is
+started once and asked over a pipe, so Python startup and the model load
+are paid once instead of on every motion event.
+"""
+import select
+import subprocess
+
+# Reply limit when the detector doesn't announce one in its ready line;
+# it normally does, sized for its capture path
+DETECT_TIMEOUT = 2.0   # seconds
+
+# Model load + camera setup; a detector not ready by then is killed
+STARTUP_TIMEOUT = 30.0   # seconds
+
+# Callers retry a dead detector at most this often, so a failing start
+# doesn't stall the sensing loop on every motion event
+RESTART_DELAY = 10.0   # seconds
+
+
+def _kill(detector):
+    detector.kill()
+    detector.wait()
+
+
+def start_detector(script="animal_detector.py", timeout=STARTUP_TIMEOUT):
+    """
+    Starts the detector once and waits up to `timeout` seconds until its
+    model and camera are ready. The reply limit it announces is kept as
+    `detector.reply_timeout`.
+    """
+    detector = subprocess.Popen(
+        ["python3", script, "--serve"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    ready, _, _ = select.select([detector.stdout], [], [], timeout)
+    if not ready:
+        _kill(detector)
+        raise TimeoutError(f"{script} was not ready within {timeout} s")
+
+    words = detector.stdout.readline().split()
+    if not words or words[0] != b"ready":
+        code = detector.poll()   # before the kill, which would make it -9
+        _kill(detector)
+        raise RuntimeError(f"{script} failed to start (exit code {code})")
+    detector.reply_timeout = float(words[1]) if len(words) > 1 else DETECT_TIMEOUT
+    return detector
+
+
+def detect_animal(detector, timeout=None):
+    """
+    Asks the running detector to classify one photo. Returns 'animal' or
+    'no_animal'. A detector that doesn't answer within `timeout` seconds
+    (by default the limit it announced) is killed, since a late reply would
+    answer the next request, so the caller should restart it.
+    """
+    if timeout is None:
+        timeout = detector.reply_timeout
+    detector.stdin.write(b"GO\n")
+    detector.stdin.flush()
+
+    ready, _, _ = select.select([detector.stdout], [], [], timeout)
+    if not ready:
+        _kill(detector)
+        raise TimeoutError(f"detector did not answer within {timeout} s")
+
+    result = detector.stdout.readline().decode().strip().lower()
+    if result not in ("animal", "no_animal"):
+        raise RuntimeError(f"detector replied {result!r}")
+    return result
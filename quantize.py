@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Post-training full-integer quantization of the Teachable Machine model.
+Produces an int8 .tflite that runs on the Pi's NEON int8 kernels (XNNPACK)
+with a quarter of the float32 weight memory.
+Run on the training machine (needs full TensorFlow, not tflite_runtime).
+"""
+
+import os
+import random
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+
+# ==================== CONFIGURATION ====================
+KERAS_MODEL_PATH = "keras_model.h5"
+OUTPUT_PATH = "realfinalnocap_int8.tflite"
+CALIBRATION_DIRS = ["animals", "nonanimals"]
+CALIBRATION_SAMPLES = 200
+
+
+def representative_dataset(img_size):
+    """Yields calibration images preprocessed like ani_det.preprocess_image."""
+    files = [
+        os.path.join(d, f)
+        for d in CALIBRATION_DIRS
+        for f in os.listdir(d)
+        if f.lower().endswith((".jpg", ".png"))
+    ]
+    random.shuffle(files)
+
+    for path in files[:CALIBRATION_SAMPLES]:
+        image = Image.open(path).convert("RGB").resize(img_size, Image.BILINEAR)
+        img_array = np.asarray(image, dtype=np.float32) / 255.0
+        yield [np.expand_dims(img_array, axis=0)]
+
+
+def quantize_model():
+    model = tf.keras.models.load_model(KERAS_MODEL_PATH, compile=False)
+    _, height, width, _ = model.input_shape
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: representative_dataset((width, height))
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+
+    with open(OUTPUT_PATH, "wb") as f:
+        f.write(converter.convert())
+    print(f"✓ Wrote {OUTPUT_PATH}; set MODEL_PATH to it in ani_det.py")
+
+
+if __name__ == "__main__":
+    quantize_model()
@@ -1,126 +1,52 @@
-import RPi.GPIO as GPIO
+from sensors import (
+    USS1_TRIG, USS1_ECHO, USS2_TRIG, USS2_ECHO, SAMPLE_PERIOD,
+    init_gpio, make_realtime, cleanup, start_sampling, latest_sample,
+    get_instant_speed, alert,
+)
+from detector import RESTART_DELAY, start_detector, detect_animal
 import time
-import subprocess
 
 # ============================================================
 # CONFIGURATION
 # ============================================================
 
-# USS1 (animal)
-USS1_TRIG = 23
-USS1_ECHO = 24
-
-# USS2 (car)
-USS2_TRIG = 17
-USS2_ECHO = 27
-
-# LED + BUZZER
-LED_PIN = 5
-BUZZER_PIN = 6
-
 # If times differ by < 1 sec → danger
 CRITICAL_TIME_DIFF = 1.0
 
-# Max time to wait for echo (seconds) to avoid infinite loops
-ECHO_TIMEOUT = 0.03  # ~30ms → ~5m range
-
-GPIO.setmode(GPIO.BCM)
-GPIO.setwarnings(False)
-
-GPIO.setup(USS1_TRIG, GPIO.OUT)
-GPIO.setup(USS1_ECHO, GPIO.IN)
-
-GPIO.setup(USS2_TRIG, GPIO.OUT)
-GPIO.setup(USS2_ECHO, GPIO.IN)
-
-GPIO.setup(LED_PIN, GPIO.OUT)
-GPIO.setup(BUZZER_PIN, GPIO.OUT)
-
+init_gpio()
+start_sampling(USS2_TRIG, USS2_ECHO, USS1_TRIG, USS1_ECHO)
 
 # ============================================================
-# ULTRASONIC MEASUREMENT
+# MAIN LOOP
 # ============================================================
 
+prev_t1 = None
+prev_d1 = None
+MOTION_THRESHOLD = 0.005   # 0.5 cm movement triggers detection
 
+# Motion polling: once per background sample (SAMPLE_PERIOD) while USS1
+# sees the scene change by > 1 cm, backing off by one period per quiet
+# sample up to 500 ms. Re-reads of the same sample are skipped, so Δ is
+# always taken between consecutive pings.
+ACTIVITY_DELTA = 0.01
+FAST_POLL = SAMPLE_PERIOD
+IDLE_POLL_MAX = 0.5
+idle_count = 0
 
-def measure_distance(trig, echo):
-    # settle line
-    GPIO.output(trig, False)
-    time.sleep(0.000002)
-
-    # trigger pulse
-    GPIO.output(trig, True)
-    time.sleep(0.00001)
-    GPIO.output(trig, False)
-
-    start = time.monotonic()
-    timeout = start + ECHO_TIMEOUT
-
-    # wait for echo HIGH
-    while GPIO.input(echo) == 0:
-        if time.monotonic() > timeout:
-            return None
-
-    t0 = time.monotonic()
-    timeout2 = t0 + ECHO_TIMEOUT
-
-    # wait for echo LOW
-    while GPIO.input(echo) == 1:
-        if time.monotonic() > timeout2:
-            return None
-
-    t1 = time.monotonic()
-
-    dt = t1 - t0
-    if dt <= 0 or dt > 0.03:   # >5 m → invalid
-        return None
-
-    return (dt * 343.0) / 2.0
-
-def measure_speed(trig_car, echo_car, trig_ani, echo_ani, delay=1.0):
-    # 1. First measurement
-    d_car_1 = measure_distance(trig_car, echo_car)
-    d_ani_1 = measure_distance(trig_ani, echo_ani)
-
-    t_start = time.monotonic()
-    time.sleep(delay)
-    t_end = time.monotonic()
-    
-    # 2. Second measurement
-    d_car_2 = measure_distance(trig_car, echo_car)
-    d_ani_2 = measure_distance(trig_ani, echo_ani)
-
-    # Calculate exact time passed for better precision
-    actual_dt = t_end - t_start
-
-    # 3. Calculate Speeds (Speed = Distance / Time)
-    # CAR
-    if d_car_1 is not None and d_car_2 is not None:
-        speed_car = (d_car_1 - d_car_2) / actual_dt
-        final_dist_car = d_car_2
-    else:
-        speed_car = 0.0
-        final_dist_car = d_car_2 if d_car_2 is not None else 0.0
-
-    # ANIMAL
-    if d_ani_1 is not None and d_ani_2 is not None:
-        speed_ani = (d_ani_1 - d_ani_2) / actual_dt
-        final_dist_ani = d_ani_2
-    else:
-        speed_ani = 0.0
-        final_dist_ani = d_ani_2 if d_ani_2 is not None else 0.0
+# earliest time.monotonic() for the next restart of a dead detector
+restart_at = 0.0
 
-    return speed_car, speed_ani, final_dist_car, final_dist_ani
-
-prev_d1 = None
-MOTION_THRESHOLD = 0.005   # 0.5 cm movement triggers detection
+detector = start_detector("ani_det.py")
+make_realtime()
 
 try:
     while True:
-        GPIO.output(LED_PIN, False)
-        GPIO.output(BUZZER_PIN, False)
-        # Step 1: detect motion via USS1
-        d1 = measure_distance(USS1_TRIG, USS1_ECHO)
+        # Step 1: detect motion via USS1 (latest background sample)
+        t1, d1 = latest_sample(USS1_ECHO)
+        if t1 is None or t1 == prev_t1:   # sampler hasn't pinged USS1 again yet
+            time.sleep(FAST_POLL / 4)
+            continue
+        prev_t1 = t1
 
         motion_detected = False
         if prev_d1 is not None and d1 is not None and d1 < 0.50:
@@ -128,46 +54,53 @@ try:
                 motion_detected = True
                 print(f"Motion detected near USS1 (Δ={abs(d1 - prev_d1):.2f} m). Checking for animal...")
 
+        # any change over 1 cm, in detection range or not, counts as activity
+        active = motion_detected or (
+            prev_d1 is not None and d1 is not None and abs(d1 - prev_d1) > ACTIVITY_DELTA
+        )
         prev_d1 = d1
 
         if not motion_detected:
-            time.sleep(0.5) # 500 ms
+            idle_count = 1 if active else idle_count + 1
+            time.sleep(min(IDLE_POLL_MAX, FAST_POLL * idle_count))
             continue
 
+        idle_count = 0
+
         # Step 2: run animal detector
         try:
-            result = subprocess.check_output(
-                ["python3", "ani_det.py"]
-            ).decode().strip().lower()
+            result = detect_animal(detector)
         except Exception as e:
-            print(f"Error running animal_detector.py: {e}")
+            print(f"Error running ani_det.py: {e}")
+            # a failed restart leaves the detector dead; keep sensing, retry later
+            if detector.poll() is not None and time.monotonic() >= restart_at:
+                restart_at = time.monotonic() + RESTART_DELAY
+                try:
+                    detector = start_detector("ani_det.py")
+                except (RuntimeError, TimeoutError) as e:
+                    print(f"⚠ Detector restart failed, retrying in {RESTART_DELAY:.0f} s: {e}")
             time.sleep(0.5) # 500 ms
             continue
 
         if "no_animal" in result:
             print("No animal detected — likely leaf, wind, etc.")
-            time.sleep(0.5) # 500 ms
             continue
 
         print("Animal confirmed by ML detector.")
 
         # ===================== ANIMAL (USS1) =====================
-        # animal_speed, animal_distance = measure_speed(USS1_TRIG, USS1_ECHO)
-
-        # if animal_speed < 0:
-            # print("There is animal close by but its going farther away.")
-            # time.sleep(0.5)
-            # continue
-
+        # speeds fitted over the samples taken while the detector ran
+        car_speed, car_distance = get_instant_speed(USS2_ECHO)
+        animal_speed, animal_distance = get_instant_speed(USS1_ECHO)
 
-        # if animal_distance is None:
-            # print("Animal distance could not be measured.")
-            # time.sleep(0.5)
-            # continue
+        if None in (car_speed, animal_speed, car_distance, animal_distance):
+            print("Car/animal speed could not be measured.")
+            continue
 
-        car_speed, animal_speed, car_distance, animal_distance = measure_speed(USS2_TRIG, USS2_ECHO,USS1_TRIG,USS1_ECHO,0.9)
-        
-        time_animal = (animal_distance - 0.06) / animal_speed
+        # not approaching → never arrives
+        time_animal = (
+            (animal_distance - 0.06) / max(animal_speed, 0.01) if animal_speed > 0 else float("inf")
+        )
         print(
             f"Animal: distance={animal_distance:.2f} m, "
             f"speed={animal_speed:.2f} m/s, "
@@ -175,10 +108,11 @@ try:
         )
 
         # ===================== CAR (USS2) =====================
-        # car_speed, car_distance = measure_speed(USS2_TRIG, USS2_ECHO)
-        if car_speed==0:
-            car_speed=0.00001
-        time_car = car_distance / car_speed
+        if car_speed <= 0:
+            print("Car is not approaching — no crash possible.")
+            continue
+
+        time_car = car_distance / max(car_speed, 0.01)
         print(
             f"Car: distance={car_distance:.2f} m, "
             f"speed={car_speed:.2f} m/s, "
@@ -200,4 +134,5 @@ except KeyboardInterrupt:
     print("Exiting...")
 
 finally:
-    GPIO.cleanup()
\ No newline at end of file
+    detector.terminate()
+    cleanup()
\ No newline at end of file
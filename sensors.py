@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Shared HC-SR04 + indicator code for the crash-predictor scripts.
+Call init_gpio() once at startup; it returns the pigpio handle.
+"""
+import ctypes
+import logging
+import numpy as np
+import os
+import pigpio
+import threading
+import time
+from collections import deque
+
+# Raw samples are logged at DEBUG; scripts opt in with logging.basicConfig
+log = logging.getLogger(__name__)
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+# USS1 (animal)
+USS1_TRIG = 23
+USS1_ECHO = 24
+
+# USS2 (car)
+USS2_TRIG = 17
+USS2_ECHO = 27
+
+# LED + BUZZER
+LED_PIN = 5
+BUZZER_PIN = 6
+
+# Max time to wait for echo (seconds) to avoid infinite loops
+ECHO_TIMEOUT = 0.03  # ~30ms → ~5m range
+ECHO_TIMEOUT_US = int(ECHO_TIMEOUT * 1e6)   # same limit in pigpio ticks
+ECHO_WAIT = 2 * ECHO_TIMEOUT   # rising edge + echo pulse each take at most ECHO_TIMEOUT
+
+# Air temperature for the speed of sound (°C); override with AMBIENT_C=...
+AMBIENT_C = float(os.getenv("AMBIENT_C", "20.0"))
+
+# Beyond this the car sensor sees nothing worth timing
+MAX_RELEVANT_DIST = 5.0  # m
+
+# Plausibility limits for speed estimates
+MAX_SPEED = 30.0        # m/s, faster than any car we care about on this road
+MAX_JUMP = 3.0          # m, a sample this far from the run's median is an echo glitch
+MIN_SPAN = 0.1          # s, shorter runs can't resolve a slope
+SPEED_EMA_ALPHA = 0.2   # weight of a new estimate in the running average
+SPEED_EMA_MAX_AGE = 2.0 # s, older averages belong to a previous object
+
+# Continuous ranging: each sensor pinged every 120 ms, the two staggered
+# by 60 ms so neither hears the other's burst; last 12 samples (~1.4 s) kept
+SAMPLE_PERIOD = 0.12   # seconds, per sensor
+HISTORY = 12
+
+# How long the LED / buzzer stay on per indication
+INDICATOR_TIME = 0.9   # seconds
+ALERT_TIME = 1.0       # seconds
+
+# SCHED_FIFO priority for the sensor loop (above the detector's 20)
+SENSOR_PRIORITY = 50
+# ...and for the background sampler thread, which owns the ping timing
+SAMPLER_PRIORITY = 60
+# ...and for pigpio's callback thread, which wakes whoever waits on an echo
+CALLBACK_PRIORITY = 65
+
+# mlockall(2) flags
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+# ============================================================
+# GPIO SETUP
+# ============================================================
+# All pin I/O goes through the pigpio daemon (sudo pigpiod); it also
+# timestamps echo edges in C with ~1 µs ticks
+pi = None
+
+# Per echo pin: last rising/falling tick and an event set on the falling edge
+_echo_state = {}
+
+# pigpio starts its callback thread itself, so the thread raises its own
+# priority on the next edge once a realtime caller asks for it
+_callback_priority = None
+
+
+def _on_echo_edge(gpio, level, tick):
+    """pigpio callback thread: records the echo pulse edges."""
+    global _callback_priority
+    if _callback_priority is not None:
+        _set_fifo(_callback_priority)
+        _callback_priority = None
+
+    state = _echo_state[gpio]
+    if level == 1:
+        state["rise"] = tick
+    elif level == 0 and state["rise"] is not None:
+        state["fall"] = tick
+        state["done"].set()
+
+
+def setup_sensor(trig, echo):
+    """Claims an HC-SR04's pins in pigpio and starts watching its echo line."""
+    pi.set_mode(trig, pigpio.OUTPUT)
+    pi.write(trig, 0)
+    pi.set_mode(echo, pigpio.INPUT)
+    _echo_state[echo] = {"rise": None, "fall": None, "done": threading.Event()}
+    pi.callback(echo, pigpio.EITHER_EDGE, _on_echo_edge)
+
+
+def init_gpio():
+    """
+    Connects to pigpiod, claims the LED, buzzer and both sensors (triggers
+    low) and lets the sensors settle. Returns the pigpio handle.
+    """
+    global pi
+    pi = pigpio.pi()
+    if not pi.connected:
+        raise RuntimeError("Cannot connect to pigpio daemon. Try: sudo pigpiod")
+
+    pi.set_mode(LED_PIN, pigpio.OUTPUT)
+    pi.set_mode(BUZZER_PIN, pigpio.OUTPUT)
+    pi.wave_clear()  # drop trigger waves left behind by a crashed run
+
+    setup_sensor(USS1_TRIG, USS1_ECHO)
+    setup_sensor(USS2_TRIG, USS2_ECHO)
+    time.sleep(0.5)  # sensor settling time
+    return pi
+
+
+def _set_fifo(priority):
+    """SCHED_FIFO for the calling thread (pid 0 means this thread on Linux)."""
+    try:
+        os.sched_setscheduler(
+            0, os.SCHED_FIFO | os.SCHED_RESET_ON_FORK, os.sched_param(priority)
+        )
+        print(f"✓ SCHED_FIFO priority {priority}")
+    except PermissionError:
+        print("⚠ No permission for SCHED_FIFO, keeping default scheduling")
+
+
+def make_realtime(priority=SENSOR_PRIORITY):
+    """
+    Switches the calling thread, and pigpio's callback thread that delivers
+    the echo edges, to SCHED_FIFO and locks the process's memory so sample
+    timestamps aren't delayed by other tasks or page faults. Only those
+    threads switch: threads and children (the detector) started afterwards
+    begin on normal scheduling, so the sampler sets its own priority. Call
+    it after the startup work; it needs root or CAP_SYS_NICE / CAP_IPC_LOCK.
+    """
+    global _callback_priority
+    _set_fifo(priority)
+    _callback_priority = CALLBACK_PRIORITY
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+        print(f"⚠ mlockall failed: {os.strerror(ctypes.get_errno())}")
+
+
+def cleanup():
+    """Turns the indicators off and releases the pigpio connection."""
+    if pi is None:
+        return
+    stop_sampling()
+    with _pulse_cond:
+        _pulse_off.clear()
+    pi.write(LED_PIN, 0)
+    pi.write(BUZZER_PIN, 0)
+    pi.wave_clear()
+    pi.stop()
+
+
+# ============================================================
+# ULTRASONIC MEASUREMENT
+# ============================================================
+
+# Trigger pins (as a sorted tuple) → id of a pigpio wave that raises them
+# all for 10 µs; built once, then replayed by DMA on every ping
+_trigger_waves = {}
+_wave_lock = threading.Lock()
+
+
+def speed_of_sound(celsius):
+    """Speed of sound in dry air in m/s (331.3 m/s at 0 °C, +0.606 per °C)."""
+    return 331.3 + 0.606 * celsius
+
+
+# Echo time → distance factor (there and back), in m per second of echo,
+# and the same per pigpio tick (µs) so measure_distance does one multiply
+SPEED_HALF = speed_of_sound(AMBIENT_C) / 2.0
+_SPEED_HALF_US = SPEED_HALF / 1e6
+
+
+def set_temperature(celsius):
+    """Updates the air temperature used to turn echo times into distances."""
+    global SPEED_HALF, _SPEED_HALF_US
+    SPEED_HALF = speed_of_sound(celsius) / 2.0
+    _SPEED_HALF_US = SPEED_HALF / 1e6
+
+
+def _trigger_wave(*trigs):
+    """Wave id for a simultaneous 10 µs pulse on `trigs`, created on first use."""
+    key = tuple(sorted(trigs))
+    with _wave_lock:
+        wid = _trigger_waves.get(key)
+        if wid is None:
+            mask = 0
+            for trig in key:
+                mask |= 1 << trig
+            pi.wave_add_generic([pigpio.pulse(mask, 0, 10), pigpio.pulse(0, mask, 0)])
+            wid = pi.wave_create()
+            _trigger_waves[key] = wid
+    return wid
+
+
+def _arm(echo):
+    """Resets an echo pin's edge state before its trigger fires."""
+    state = _echo_state[echo]
+    state["rise"] = None
+    state["done"].clear()
+    return state
+
+
+def _echo_distance(state, deadline):
+    """Waits until `deadline` (time.monotonic()) for an armed echo pulse; distance in meters or None."""
+    if not state["done"].wait(max(0.0, deadline - time.monotonic())):
+        return None
+
+    # tickDiff unwraps the 32-bit tick counter, so the width is never negative
+    us = pigpio.tickDiff(state["rise"], state["fall"])
+    if us > ECHO_TIMEOUT_US:   # >5 m → invalid
+        return None
+
+    return us * _SPEED_HALF_US
+
+
+def measure_distance(trig, echo):
+    """
+    HC-SR04 distance in meters, or None on timeout / out of range.
+    Blocks on the falling-edge event instead of polling the pin; the pulse
+    width comes from pigpio's hardware ticks, not Python timestamps.
+    """
+    state = _arm(echo)
+    pi.wave_send_once(_trigger_wave(trig))
+    return _echo_distance(state, time.monotonic() + ECHO_WAIT)
+
+
+def measure_pair(trig_car, echo_car, trig_ani, echo_ani):
+    """
+    Pings the car and animal sensors at the same instant with one wave
+    covering both triggers, then collects each echo (independent pins).
+    Both echoes share one deadline, so a pair never waits longer than a
+    single ping. Returns (car_dist, animal_dist, t) where t is the
+    time.monotonic_ns() stamp at which the pings were fired.
+    """
+    car, ani = _arm(echo_car), _arm(echo_ani)
+    pi.wave_send_once(_trigger_wave(trig_car, trig_ani))
+    t = time.monotonic_ns()
+    deadline = time.monotonic() + ECHO_WAIT
+    return _echo_distance(car, deadline), _echo_distance(ani, deadline), t
+
+# ============================================================
+# SPEED MEASUREMENT
+# ============================================================
+
+def approach_speed(ts, ds):
+    """
+    Speed in m/s (positive = approaching) and latest distance from a run of
+    distance samples. A sliding median (window 5, shrinking at the ends)
+    knocks out single-ping multipath spikes, the first and latest sample
+    included, then a least-squares line is fitted over time.
+    Failed pings (None) and samples more than MAX_JUMP from the run's
+    median are skipped. The speed is None when it can't be estimated
+    (fewer than two valid samples, or a run shorter than MIN_SPAN).
+
+    A stationary target with a spike at either end reads still, at its real
+    distance (run with python3 -m doctest sensors.py):
+
+    >>> ts = [i * 100_000_000 for i in range(6)]   # ns, 100 ms apart
+    >>> for ds in ([4, 4, 4, 4, 4, 5.5], [2.5, 4, 4, 4, 4, 4]):
+    ...     speed, dist = approach_speed(ts, ds)
+    ...     print(abs(speed) < 1e-9, dist)
+    True 4.0
+    True 4.0
+    """
+    ts = np.asarray(ts, dtype=np.int64)
+    ds = np.asarray(ds, dtype=np.float64)   # None → nan
+    ok = ~np.isnan(ds)
+    if ok.any():
+        ok &= np.abs(ds - np.nanmedian(ds)) <= MAX_JUMP
+    ts, ds = ts[ok], ds[ok]
+    if len(ds) < 2 or (ts[-1] - ts[0]) * 1e-9 < MIN_SPAN:
+        return None, (float(ds[-1]) if len(ds) else None)
+
+    # integer ns offsets, converted to seconds once
+    xs = (ts - ts[0]) * 1e-9
+
+    # -------- median smoothing (sliding window, shrinking at the ends) --------
+    # NaN padding drops out of nanmedian, so the end windows hold only real
+    # samples; edge padding would repeat the endpoint until it wins the vote
+    k = 2  # median window radius
+    windows = np.lib.stride_tricks.sliding_window_view(
+        np.pad(ds, k, constant_values=np.nan), 2 * k + 1
+    )
+    smoothed = np.nanmedian(windows, axis=1)
+
+    # -------- least-squares slope --------
+    xc = xs - xs.mean()
+    denom = np.dot(xc, xc)
+    if denom == 0:
+        return None, float(smoothed[-1])
+
+    # slope is Δdistance / Δtime, negative while closing in
+    slope = np.dot(xc, smoothed - smoothed.mean()) / denom
+    return float(-slope), float(smoothed[-1])
+
+
+# Per echo pin: (smoothed speed, time.monotonic_ns() of the update)
+_speed_ema = {}
+
+
+def _smooth_speed(echo, speed, alpha=SPEED_EMA_ALPHA):
+    """
+    Plausibility check + EMA across successive estimates for one sensor.
+    A missing speed (None) or one above MAX_SPEED is replaced by the last
+    good value, or None without one; an average older than
+    SPEED_EMA_MAX_AGE is discarded rather than mixed into a new object's
+    speed. The EMA steadies the short one-shot windows but lags: with the
+    default alpha a car that speeds up reads low for several calls.
+    alpha=1.0 keeps only the plausibility check.
+    """
+    now = time.monotonic_ns()
+    prev = _speed_ema.get(echo)
+    if prev is not None and (now - prev[1]) * 1e-9 > SPEED_EMA_MAX_AGE:
+        prev = None
+
+    if speed is None or abs(speed) > MAX_SPEED:
+        return prev[0] if prev is not None else None
+
+    if prev is not None:
+        speed = (1.0 - alpha) * prev[0] + alpha * speed
+    _speed_ema[echo] = (speed, now)
+    return speed
+
+
+def measure_speed(trig, echo, samples=6, delay_s=0.035):
+    """
+    Single-sensor speed: `samples` pings, `delay_s` seconds between them.
+    Returns (speed_mps, last_distance_m); speed is positive when approaching
+    and None if it couldn't be measured. Gives up with (None, None) straight
+    away if the first ping gets no echo.
+    """
+    ts = np.empty(samples, dtype=np.int64)
+    ds = np.empty(samples, dtype=np.float64)
+
+    for i in range(samples):
+        d = measure_distance(trig, echo)
+        if d is None and i == 0:
+            return None, None
+        ds[i] = np.nan if d is None else d
+        ts[i] = time.monotonic_ns()
+        time.sleep(delay_s)
+
+    speed, dist = approach_speed(ts, ds)
+    return _smooth_speed(echo, speed), dist
+
+
+def sample_pair(trig_car, echo_car, trig_ani, echo_ani, duration_s, samples, max_car_dist=None):
+    """
+    Pings both sensors `samples` times spread over `duration_s` seconds.
+    With `max_car_dist`, stops after the first ping if no car is within it.
+    Returns (ts, ds_car, ds_ani) as arrays; failed pings are nan.
+    """
+    ts = np.empty(samples, dtype=np.int64)
+    ds = np.full((2, samples), np.nan)   # rows: car, animal
+    gap_s = duration_s / (samples - 1) if samples > 1 else 0.0
+    n = samples
+    for i in range(samples):
+        d_car, d_ani, t = measure_pair(trig_car, echo_car, trig_ani, echo_ani)
+        ts[i] = t
+        if d_car is not None:
+            ds[0, i] = d_car
+        if d_ani is not None:
+            ds[1, i] = d_ani
+        if i == 0 and max_car_dist is not None and (d_car is None or d_car > max_car_dist):
+            n = 1
+            break
+        if i < samples - 1:
+            time.sleep(gap_s)
+    return ts[:n], ds[0, :n], ds[1, :n]
+
+
+def measure_speed_dual(trig_car, echo_car, trig_ani, echo_ani, delay_s=1.0, samples=6,
+                       indicate=(), max_car_dist=MAX_RELEVANT_DIST):
+    """
+    Measures speed for both Car and Animal simultaneously from `samples`
+    paired pings spread evenly over a `delay_s`-second window. Pins in
+    `indicate` are pulsed for INDICATOR_TIME when sampling starts. If the
+    first ping finds no car within `max_car_dist` (None: always sample),
+    both speeds are None and the first distances are returned straight
+    away. A speed is also None when it couldn't be measured.
+    Returns: (car_speed, animal_speed, car_dist, animal_dist)
+    """
+    # 1. Sample both sensors across the interval
+    for pin in indicate:
+        pulse(pin, INDICATOR_TIME)
+    ts, ds_car, ds_ani = sample_pair(
+        trig_car, echo_car, trig_ani, echo_ani, delay_s, samples, max_car_dist
+    )
+    if len(ts) == 1 and samples > 1:
+        log.debug("no car within %s m (car=%s)", max_car_dist, ds_car[0])
+        return None, None, float(np.nan_to_num(ds_car[0])), float(np.nan_to_num(ds_ani[0]))
+
+    # 2. Median-filtered least-squares speed per sensor
+    # Positive speed = approaching, Negative = moving away
+    car_speed, final_car_dist = approach_speed(ts, ds_car)
+    ani_speed, final_ani_dist = approach_speed(ts, ds_ani)
+    car_speed = _smooth_speed(echo_car, car_speed)
+    ani_speed = _smooth_speed(echo_ani, ani_speed)
+
+    if final_car_dist is None:
+        final_car_dist = 0.0
+    if final_ani_dist is None:
+        final_ani_dist = 0.0
+
+    log.debug("animal distances=%s", ds_ani)
+    log.debug("car distances=%s", ds_car)
+    log.debug("times (ns)=%s", ts)
+    log.debug("actual dt=%.3f s", (ts[-1] - ts[0]) * 1e-9)
+    log.debug("car speed=%s", car_speed)
+    log.debug("animal speed=%s", ani_speed)
+    return car_speed, ani_speed, final_car_dist, final_ani_dist
+
+# ============================================================
+# CONTINUOUS SAMPLING
+# ============================================================
+# A background thread keeps pinging the sensors in turn, so a speed fitted over
+# the last HISTORY samples is available at any moment instead of after a
+# fresh sampling window. While it runs, don't ping its sensors directly.
+
+# Per echo pin: ring buffers of time.monotonic_ns() stamps and distances
+# (None for failed pings), oldest first
+_history = {}
+_history_lock = threading.Lock()
+_stop_sampling = threading.Event()
+_sampler = None
+
+
+def _sample_loop(trig_car, echo_car, trig_ani, echo_ani, period):
+    global _callback_priority
+    # SCHED_RESET_ON_FORK means this thread never inherits FIFO; it also
+    # needs the callback thread that sets its echo events at least as high
+    _set_fifo(SAMPLER_PRIORITY)
+    _callback_priority = CALLBACK_PRIORITY
+
+    # alternate the sensors half a period apart; each keeps its own stamps
+    sensors = ((trig_car, echo_car), (trig_ani, echo_ani))
+    step = period / len(sensors)
+    next_t = time.monotonic()
+    i = 0
+    while not _stop_sampling.is_set():
+        trig, echo = sensors[i]
+        i = (i + 1) % len(sensors)
+        t = time.monotonic_ns()
+        d = measure_distance(trig, echo)
+        with _history_lock:
+            ts, ds = _history[echo]
+            ts.append(t)
+            ds.append(d)
+
+        next_t += step
+        delay = next_t - time.monotonic()
+        if delay < 0:   # fell behind (echo timeouts); don't burst to catch up
+            next_t = time.monotonic()
+            delay = 0
+        _stop_sampling.wait(delay)
+
+
+def start_sampling(trig_car, echo_car, trig_ani, echo_ani, period=SAMPLE_PERIOD):
+    """
+    Starts pinging each sensor every `period` seconds in the background,
+    car and animal staggered by half a period.
+    """
+    global _sampler
+    for echo in (echo_car, echo_ani):
+        _history[echo] = (deque(maxlen=HISTORY), deque(maxlen=HISTORY))
+    _stop_sampling.clear()
+    _sampler = threading.Thread(
+        target=_sample_loop,
+        args=(trig_car, echo_car, trig_ani, echo_ani, period),
+        daemon=True,
+    )
+    _sampler.start()
+
+
+def stop_sampling():
+    """Stops the background sampler, if running."""
+    if _sampler is not None:
+        _stop_sampling.set()
+        _sampler.join()
+
+
+def latest_sample(echo):
+    """
+    Most recent background sample for `echo` as (monotonic_ns, meters);
+    (None, None) before the first one. The stamp tells a new sample from a
+    re-read of the same one.
+    """
+    with _history_lock:
+        if echo not in _history or not _history[echo][1]:
+            return None, None
+        ts, ds = _history[echo]
+        return ts[-1], ds[-1]
+
+
+def get_instant_speed(echo):
+    """
+    (speed_mps, distance_m) fitted over the background samples for `echo`;
+    speed is positive when approaching, either is None without data. The
+    fit already spans ~1.4 s of samples, so it isn't averaged with earlier
+    calls: an EMA on top would report a car that just started approaching
+    at a fraction of its speed.
+    """
+    if echo not in _history:
+        return None, None
+
+    # copy straight out of the ring buffers; nothing else is allocated per sample
+    with _history_lock:
+        ts = np.array(_history[echo][0], dtype=np.int64)
+        ds = np.array(_history[echo][1], dtype=np.float64)   # None → nan
+
+    speed, dist = approach_speed(ts, ds)
+    return _smooth_speed(echo, speed, alpha=1.0), dist
+
+# ============================================================
+# ALERT SYSTEM
+# ============================================================
+
+# Per output pin: time.monotonic() at which it is switched off. One thread
+# serves every pulse; a Timer per pulse would lock a fresh 8 MB stack each
+# time under make_realtime()'s mlockall(MCL_FUTURE)
+_pulse_off = {}
+_pulse_cond = threading.Condition()
+_pulser = None
+
+
+def _pulse_loop():
+    with _pulse_cond:
+        while True:
+            now = time.monotonic()
+            for pin, off in list(_pulse_off.items()):
+                if off <= now:
+                    pi.write(pin, 0)
+                    del _pulse_off[pin]
+            _pulse_cond.wait(min(_pulse_off.values()) - now if _pulse_off else None)
+
+
+def pulse(pin, duration):
+    """
+    Drives `pin` high now and low again after `duration` seconds on the
+    shared switch-off thread, so the caller doesn't sleep through the
+    indication. Pulsing a pin that is already on restarts its countdown.
+    """
+    global _pulser
+    with _pulse_cond:
+        pi.write(pin, 1)
+        _pulse_off[pin] = time.monotonic() + duration
+        if _pulser is None:
+            _pulser = threading.Thread(target=_pulse_loop, daemon=True)
+            _pulser.start()
+        _pulse_cond.notify()
+
+
+def alert(pins=(LED_PIN, BUZZER_PIN)):
+    """Sounds the alarm on `pins` for ALERT_TIME seconds without blocking."""
+    print("🚨 RED ALERT: Possible crash!")
+    for pin in pins:
+        pulse(pin, ALERT_TIME)